@@ -1,161 +1,142 @@
 import streamlit as st
-import simpy
-import random
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+
+from queue_sim import BACKLOG_DTYPE, day_seed, replicate, simulate_day
 
 # --- CONFIGURATION ---
-RANDOM_SEED = 42
-HOURS_PER_DAY = 24
-REVENUE_PER_ORDER = 1000
-MAX_LEAD_TIME_FOR_BONUS = 24.0
-LATE_PENALTY = 500
+# Factory model parameters (arrival rate, processing times, revenue rules) live in queue_sim.py
 MACHINE_COST = 20000
-
-# Mean processing times (hours)
-PROC_TIMES = {
-    'Prep': 1.5,
-    'Assembly': 3.0,
-    'Testing': 2.0
-}
-ARRIVAL_RATE_MEAN = 1.2 
+FORECAST_DAYS = 5
+FORECAST_REPS = 100
+# Machine counts are int8 arrays in station order (Prep, Assembly, Testing)
+STATION_LABELS = ("Station 1 (Prep)", "Station 2 (Assembly)", "Station 3 (Testing)")
+MAX_MACHINES = int(np.iinfo(np.int8).max)
 
 # --- SESSION STATE INITIALIZATION ---
 # This block runs only once when the user first loads the page
-if 'sim_state' not in st.session_state:
-    st.session_state['sim_state'] = {
+# Each field is its own session-state key so they can be read and updated independently
+if 'day' not in st.session_state:
+    st.session_state.update({
         'day': 0,
         'cash': 50000,          # Starting Capital
-        'history_logs': [],     # To store completed orders
-        'backlog': [],          # Orders currently stuck in the factory
+        'history_logs': {       # Completed orders, one array per field
+            'order_id': np.empty(0, dtype=np.int32),
+            'revenue': np.empty(0, dtype=np.int32),
+            'day': np.empty(0, dtype=np.int16),
+            'lead': np.empty(0, dtype=np.float32)
+        },
+        'daily_revenue': {},    # Day completed -> revenue, for the bar chart
+        'last_lead': None,      # Lead time of the most recently completed order
+        'backlog': np.empty(0, dtype=BACKLOG_DTYPE),  # Orders currently stuck in the factory
         'last_order_id': 0,     # Unique ID tracker
+        'machines_owned': np.ones(len(STATION_LABELS), dtype=np.int8),
         'game_over': False
-    }
+    })
 
 # --- SIMULATION ENGINE (ONE DAY AT A TIME) ---
-class DailyFactory:
-    def __init__(self, env, machine_counts, initial_backlog, start_order_id):
-        self.env = env
-        self.stations = {name: simpy.Resource(env, capacity=c) for name, c in machine_counts.items()}
-        self.completed_orders = []
-        self.remaining_backlog = [] # Orders that don't finish today
-        self.order_id_counter = start_order_id
-        
-        # Load existing backlog into the system immediately at time 0
-        for order in initial_backlog:
-            env.process(self.process_order(order['id'], order['arrival_time_global'], is_new=False))
-
-    def process_order(self, order_id, arrival_time_global, is_new=True):
-        # 1. Prep
-        with self.stations['Prep'].request() as req:
-            yield req
-            yield self.env.timeout(random.expovariate(1.0 / PROC_TIMES['Prep']))
-        
-        # 2. Assembly
-        with self.stations['Assembly'].request() as req:
-            yield req
-            yield self.env.timeout(random.expovariate(1.0 / PROC_TIMES['Assembly']))
-            
-        # 3. Testing
-        with self.stations['Testing'].request() as req:
-            yield req
-            yield self.env.timeout(random.expovariate(1.0 / PROC_TIMES['Testing']))
-            
-        # Finished!
-        finish_time_global = arrival_time_global + (self.env.now if is_new else self.env.now) 
-        # Note: Time logic is simplified here. In 'Day' chunks, env.now is time *since start of day*.
-        # Detailed timestamp tracking requires carrying 'global clock', simplified for this demo.
-        
-        lead_time = finish_time_global - arrival_time_global # Approx
-        
-        # Calculate Cash
-        revenue = REVENUE_PER_ORDER
-        if lead_time > MAX_LEAD_TIME_FOR_BONUS:
-            revenue -= LATE_PENALTY
-            
-        self.completed_orders.append({
-            'Order ID': order_id,
-            'Revenue': revenue,
-            'Day Completed': st.session_state['sim_state']['day'] + 1,
-            'Lead Time': lead_time
-        })
+# The day itself is simulated in queue_sim.py, which also holds the forecast's replicate().
+# A day's outcome is fully determined by its inputs (the RNG is seeded per day),
+# so identical days are served from the cache instead of being re-simulated.
+@st.cache_data(max_entries=64)
+def _simulate_day(machine_counts_tuple, rng_seed, day, backlog, last_order_id):
+    return simulate_day(machine_counts_tuple, rng_seed, day, backlog, last_order_id)
 
 def run_one_day(machine_counts):
-    state = st.session_state['sim_state']
-    
-    # Setup Environment for 24 hours
-    env = simpy.Environment()
-    factory = DailyFactory(env, machine_counts, state['backlog'], state['last_order_id'])
-    
-    # Generator: New Orders arriving TODAY
-    def daily_arrivals():
-        t = 0
-        while True:
-            interarrival = random.expovariate(1.0 / ARRIVAL_RATE_MEAN)
-            t += interarrival
-            if t > HOURS_PER_DAY:
-                break # Stop generating orders after 24 hours
-            
-            yield env.timeout(interarrival)
-            state['last_order_id'] += 1
-            # Current Global Time = (Previous Days * 24) + Current Time
-            global_arrival = (state['day'] * 24) + t
-            env.process(factory.process_order(state['last_order_id'], global_arrival))
-
-    env.process(daily_arrivals())
-    env.run(until=HOURS_PER_DAY)
-    
+    state = st.session_state
+
+    completed_orders, state['backlog'], state['last_order_id'] = _simulate_day(
+        tuple(machine_counts.tolist()),
+        day_seed(state['day']),
+        state['day'],
+        state['backlog'],
+        state['last_order_id'])
+
     # --- END OF DAY PROCESSING ---
-    
+
     # 1. Update Cash with revenue from completed orders
-    daily_revenue = sum([o['Revenue'] for o in factory.completed_orders])
+    daily_revenue = int(completed_orders['revenue'].sum())
     state['cash'] += daily_revenue
-    
+
     # 2. Add completed orders to history
-    state['history_logs'].extend(factory.completed_orders)
-    
-    # 3. Identify Backlog (Orders that started but didn't finish)
-    # In SimPy, we can't easily "extract" running processes. 
-    # Workaround: We count (Orders In - Orders Out)
-    total_in = len(state['backlog']) + (state['last_order_id'] - (state['last_order_id'] - len(factory.completed_orders))) # Logic simplification
-    # Better logic: We simply rebuild the backlog list based on IDs not found in completed
-    
-    # Get all IDs that were active today
-    completed_ids = {o['Order ID'] for o in factory.completed_orders}
-    
-    # Rebuild backlog: (Old Backlog + New Arrivals) - Completed
-    # Create a list of all potential orders today
-    # Note: For a robust simulation, we'd need more complex object tracking. 
-    # This is a heuristic: "If you didn't finish, you are in backlog for tomorrow"
-    
-    # Approximate Backlog Calculation for Educational Visuals
-    orders_arrived_today = state['last_order_id'] - (state['last_order_id'] - int(HOURS_PER_DAY/ARRIVAL_RATE_MEAN)) # Approx
-    # We will just track the count for the 'Queue' visual:
-    # Proper way: The simulation engine is tricky to serialize. 
-    # We will assume any order not in 'completed' is still in 'backlog' implicitly.
-    # To keep code simple/stable, we won't serialize individual order objects (too complex for one file).
-    # We will simulate the "Cost" of backlog by just counting queue size next day.
-    
+    history = state['history_logs']
+    for field, values in completed_orders.items():
+        history[field] = np.concatenate([history[field], values])
+
     # Increment Day
     state['day'] += 1
 
+    # 3. Keep chart/metric inputs current so the UI never has to scan the history
+    state['daily_revenue'][state['day']] = daily_revenue
+    if completed_orders['lead'].size > 0:
+        state['last_lead'] = float(completed_orders['lead'][-1])
+
 # --- STREAMLIT UI ---
+def _purchase_cost(machine_counts):
+    # Simple Logic: User inputs Total Machines. If Total > Previous Total, charge diff.
+    delta = np.maximum(machine_counts - st.session_state['machines_owned'], 0)
+    return int(delta.sum()) * MACHINE_COST
+
+def _run_day():
+    state = st.session_state
+
+    # Read the inputs from session state: button args are bound when the button is
+    # drawn, so they would miss a count changed in the same interaction as the click
+    machine_counts = np.array([state[f'machines_{i}'] for i in range(len(STATION_LABELS))],
+                              dtype=np.int8)
+    cost = _purchase_cost(machine_counts)
+    state['machines_owned'] = np.maximum(machine_counts, state['machines_owned'])
+
+    if cost > 0:
+        state['cash'] -= cost
+        st.toast(f"Bought machines! -${cost}")
+
+    run_one_day(machine_counts)
+
+def _forecast_cash(machine_counts):
+    # Cash at the end of each of the next FORECAST_DAYS days, one row per replication.
+    # Runs in-process: the whole forecast takes well under a tenth of a second, less
+    # than a worker pool costs to start and feed.
+    state = st.session_state
+    counts = tuple(machine_counts.tolist())
+    revenue = np.array([
+        replicate(rep, counts, state['day'], FORECAST_DAYS, state['backlog'], state['last_order_id'])
+        for rep in range(FORECAST_REPS)
+    ])
+    return state['cash'] - _purchase_cost(machine_counts) + np.cumsum(revenue, axis=1)
+
+# Only rebuilt when orders have been added, not on every widget interaction. Kept in
+# session state rather than st.cache_data: the (order count, last id) key is cheap to
+# check but is not unique across sessions, and hashing the arrays costs O(orders).
+def _history_frame():
+    state = st.session_state
+    history = state['history_logs']
+    key = (len(history['order_id']), state['last_order_id'])
+    if state.get('history_frame_key') != key:
+        state['history_frame'] = pd.DataFrame({
+            'Order ID': pd.Series(history['order_id'], dtype=np.int32),
+            'Revenue': pd.Series(history['revenue'], dtype=np.int32),
+            'Day Completed': pd.Series(history['day'], dtype=np.int16),
+            'Lead Time': pd.Series(history['lead'], dtype=np.float32)
+        })
+        state['history_frame_key'] = key
+    return state['history_frame']
+
 st.set_page_config(layout="wide", page_title="Littlefield Lite")
 
 st.markdown("## 🏭 Littlefield Lite: Supply Chain Commander")
-state = st.session_state['sim_state']
+state = st.session_state
 
 # TOP METRICS ROW
 col1, col2, col3, col4 = st.columns(4)
 col1.metric("Day", f"{state['day']} / 30")
 col2.metric("Cash Balance", f"${state['cash']:,.0f}")
-if len(state['history_logs']) > 0:
-    last_lead = state['history_logs'][-1]['Lead Time']
-    col3.metric("Last Lead Time", f"{last_lead:.1f} hrs")
+if state['last_lead'] is not None:
+    col3.metric("Last Lead Time", f"{state['last_lead']:.1f} hrs")
 else:
     col3.metric("Last Lead Time", "--")
     
-col4.metric("Orders Completed", len(state['history_logs']))
+col4.metric("Orders Completed", len(state['history_logs']['order_id']))
 
 st.divider()
 
@@ -166,52 +147,56 @@ with c1:
     st.subheader("🛠️ Factory Controls")
     st.info("Buying a machine deducts $20,000 immediately. You cannot sell machines.")
     
-    m1 = st.number_input("Station 1 (Prep)", min_value=1, value=1)
-    m2 = st.number_input("Station 2 (Assembly)", min_value=1, value=1)
-    m3 = st.number_input("Station 3 (Testing)", min_value=1, value=1)
+    m1, m2, m3 = (st.number_input(label, min_value=1, max_value=MAX_MACHINES, value=1, key=f'machines_{i}')
+                  for i, label in enumerate(STATION_LABELS))
     
-    machine_counts = {'Prep': m1, 'Assembly': m2, 'Testing': m3}
+    machine_counts = np.array([m1, m2, m3], dtype=np.int8)
     
-    if st.button("▶️ RUN NEXT DAY", type="primary"):
-        if state['day'] < 30:
-            # Calculate cost of new machines if any (Simplified: we charge for TOTAL machines held, 
-            # normally you'd track delta. For this simplified version, we won't deduct repeat costs, 
-            # only if user increases count manually. 
-            # *Fix*: We will just charge a 'Daily OpEx' or assume machines are bought once.
-            # Let's assume machines are rented per day to simplify the math? 
-            # No, let's just do Purchase logic:
-            
-            # Simple Logic: User inputs Total Machines. If Total > Previous Total, charge diff.
-            # We need to store previous machine counts to calculate cost.
-            if 'machines_owned' not in state:
-                state['machines_owned'] = {'Prep':1, 'Assembly':1, 'Testing':1}
-                
-            # Calculate Capex
-            cost = 0
-            for k, v in machine_counts.items():
-                diff = v - state['machines_owned'][k]
-                if diff > 0:
-                    cost += (diff * MACHINE_COST)
-                    state['machines_owned'][k] = v # Update owned count
-            
-            if cost > 0:
-                state['cash'] -= cost
-                st.toast(f"Bought machines! -${cost}")
-            
-            run_one_day(machine_counts)
-            st.rerun() # Refresh page to show new data
-        else:
-            st.warning("Simulation Ended (Day 30)")
-
-    if st.button("Reset Game"):
-        for key in list(st.session_state.keys()):
-            del st.session_state[key]
-        st.rerun()
+    # The day runs in the click callback, before this script reruns, so the page
+    # already reflects it on that rerun -- no second st.rerun() pass needed
+    st.button("▶️ RUN NEXT DAY", type="primary", disabled=state['day'] >= 30,
+              on_click=_run_day)
+    if state['day'] >= 30:
+        st.warning("Simulation Ended (Day 30)")
+
+    st.button("Reset Game", on_click=st.session_state.clear)
+
+    with st.expander("🔬 Compare Policies"):
+        st.caption("Replays today's orders against the current setup and an alternative one.")
+        alt_counts = np.array([
+            st.number_input(f"Alt. {label}", min_value=1, max_value=MAX_MACHINES, value=count, key=f'alt_{i}')
+            for i, (label, count) in enumerate(zip(STATION_LABELS, (m1, m2, m3)))
+        ], dtype=np.int8)
+        if st.button("Compare"):
+            rows = {}
+            for label, counts in [("Current", machine_counts), ("Alternative", alt_counts)]:
+                done, left, _ = _simulate_day(
+                    tuple(counts.tolist()), day_seed(state['day']), state['day'],
+                    state['backlog'], state['last_order_id'])
+                rows[label] = {
+                    'Orders Completed': done['order_id'].size,
+                    'Revenue': int(done['revenue'].sum()),
+                    'Avg Lead Time (hrs)': float(done['lead'].mean()) if done['lead'].size else None,
+                    'Backlog at Midnight': left.size
+                }
+            st.table(pd.DataFrame.from_dict(rows, orient='index'))
+
+    with st.expander("⏩ Fast-Forward Forecast"):
+        st.caption(f"Runs the next {FORECAST_DAYS} days {FORECAST_REPS} times with the current setup "
+                   "(including any machines you would buy). The game itself does not advance.")
+        if st.button(f"Forecast {FORECAST_DAYS} days × {FORECAST_REPS} runs"):
+            cash = _forecast_cash(machine_counts)
+            days = np.arange(state['day'] + 1, state['day'] + FORECAST_DAYS + 1)
+            st.line_chart(pd.DataFrame({
+                'Min': cash.min(axis=0),
+                'Median': np.median(cash, axis=0),
+                'Max': cash.max(axis=0)
+            }, index=pd.Index(days, name='Day')))
 
 with c2:
     # CHARTS
-    if len(state['history_logs']) > 0:
-        df = pd.DataFrame(state['history_logs'])
+    if len(state['history_logs']['order_id']) > 0:
+        df = _history_frame()
         
         tab_a, tab_b = st.tabs(["Lead Times", "Daily Revenue"])
         
@@ -220,8 +205,7 @@ with c2:
             st.caption("Target: Keep Lead Time below 24 hours.")
             
         with tab_b:
-            daily_rev = df.groupby("Day Completed")['Revenue'].sum()
-            st.bar_chart(daily_rev)
+            st.bar_chart(pd.Series(state['daily_revenue'], dtype=np.int32))
     else:
         st.write("waiting for data...")
         
@@ -238,3 +222,8 @@ def draw_station(name, count):
 with q_col1: draw_station("Station 1", m1)
 with q_col2: draw_station("Station 2", m2)
 with q_col3: draw_station("Station 3", m3)
+
+if state['backlog'].size > 0:
+    # Every order id is either completed or in the backlog, so the oldest open one is here
+    oldest_open = int(state['backlog']['id'].min())
+    st.caption(f"{state['backlog'].size} orders still in the factory (oldest: #{oldest_open})")
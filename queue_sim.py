@@ -0,0 +1,193 @@
+# Factory model for the game: a tandem line of FIFO stations with parallel machines,
+# simulated one day at a time without an event loop.
+# Numba is optional -- without it the multi-machine loop runs as plain Python.
+import heapq
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+# --- FACTORY MODEL ---
+RANDOM_SEED = 42
+HOURS_PER_DAY = 24
+REVENUE_PER_ORDER = 1000
+MAX_LEAD_TIME_FOR_BONUS = 24.0
+LATE_PENALTY = 500
+
+# Mean processing times (hours)
+PROC_TIMES = {
+    'Prep': 1.5,
+    'Assembly': 3.0,
+    'Testing': 2.0
+}
+ARRIVAL_RATE_MEAN = 1.2
+
+# Orders still in the factory at midnight: the station they were at and the hours of work left there
+BACKLOG_DTYPE = np.dtype([
+    ('id', np.int32),
+    ('arrival_global', np.float64),
+    ('stage', np.int8),
+    ('stage_remaining_hours', np.float64)
+])
+
+# Fixed per-day inputs, worked out once instead of on every simulated day
+_STATIONS = tuple(PROC_TIMES)
+_PROC_MEANS = np.array([PROC_TIMES[name] for name in _STATIONS])
+# Draw ~3x the expected number of arrivals in one go; topping up is practically never needed
+_ARRIVALS_PER_DRAW = int(HOURS_PER_DAY / ARRIVAL_RATE_MEAN * 3)
+
+
+def _advance_multi(arrivals, service, capacity):
+    # Each order takes whichever machine frees up first. Machine free times are kept
+    # as a binary min-heap (heapq.heapreplace on a list).
+    free = [0.0] * capacity
+    departures = np.empty_like(arrivals)
+    heapreplace = heapq.heapreplace  # local lookups in the per-order loop
+    for i, (arrival, job) in enumerate(zip(arrivals.tolist(), service.tolist())):
+        done = max(arrival, free[0]) + job
+        departures[i] = done
+        heapreplace(free, done)
+    return departures
+
+
+def _advance_multi_jit(arrivals, service, capacity):
+    # Same as _advance_multi, with the heap sifted by hand (Numba has no heapq)
+    free = np.zeros(capacity)
+    departures = np.empty_like(arrivals)
+    for i in range(arrivals.size):
+        done = max(arrivals[i], free[0]) + service[i]
+        departures[i] = done
+        # The new free time is never below the old root, so replace the root and sift down
+        j = 0
+        while True:
+            child = 2 * j + 1
+            if child >= capacity:
+                break
+            if child + 1 < capacity and free[child + 1] < free[child]:
+                child += 1
+            if free[child] >= done:
+                break
+            free[j] = free[child]
+            j = child
+        free[j] = done
+    return departures
+
+
+if njit is not None:
+    _advance_multi = njit(cache=True, fastmath=True)(_advance_multi_jit)
+    _advance_multi(np.zeros(1), np.zeros(1), 2)  # compile (or load from cache) at import
+
+
+def advance(arrivals, service, capacity):
+    # arrivals must be sorted; returns the departure time of each order
+    if capacity == 1:
+        # Single machine: d[i] = max(a[i], d[i-1]) + s[i], solved with a running max
+        done = np.cumsum(service)
+        return np.maximum.accumulate(arrivals - (done - service)) + done
+    return _advance_multi(arrivals, service, int(capacity))
+
+
+def run_line(arrivals, service, capacities, stage=None):
+    # Push orders through each station in turn: departures from one are arrivals at the next.
+    # service has one column per station; stage is the station each order (re)enters at
+    # (default: all start at the first). Returns (starts, departures) shaped like service,
+    # NaN at stations an order skipped.
+    t = np.array(arrivals, dtype=float)
+    if stage is None:
+        stage = np.zeros(t.size, dtype=int)
+    starts = np.full(service.shape, np.nan)
+    departures = np.full(service.shape, np.nan)
+    for k, capacity in enumerate(capacities):
+        idx = np.flatnonzero(stage <= k)
+        idx = idx[np.argsort(t[idx], kind='stable')]
+        t[idx] = advance(t[idx], service[idx, k], capacity)
+        departures[idx, k] = t[idx]
+        starts[idx, k] = t[idx] - service[idx, k]
+    return starts, departures
+
+
+def day_seed(day):
+    # Same seed for a given day no matter the machine setup, so two setups can be
+    # compared on the same orders (common random numbers)
+    return (RANDOM_SEED, day)
+
+
+def simulate_day(machine_counts_tuple, rng_seed, day, backlog, last_order_id):
+    # machine_counts_tuple holds one machine count per station, in PROC_TIMES order
+    # Separate streams for arrivals and service times: changing the machine setup
+    # never changes which orders show up
+    if not isinstance(rng_seed, np.random.SeedSequence):
+        rng_seed = np.random.SeedSequence(rng_seed)
+    arrival_rng, service_rng = (np.random.default_rng(s) for s in rng_seed.spawn(2))
+
+    # New orders arriving TODAY (stop generating orders after 24 hours)
+    arrivals = np.cumsum(arrival_rng.exponential(ARRIVAL_RATE_MEAN, _ARRIVALS_PER_DRAW))
+    while arrivals[-1] < HOURS_PER_DAY:
+        arrivals = np.concatenate([arrivals, arrivals[-1] + np.cumsum(arrival_rng.exponential(ARRIVAL_RATE_MEAN, _ARRIVALS_PER_DRAW))])
+    arrivals = arrivals[arrivals < HOURS_PER_DAY]
+
+    # Backlog from yesterday is loaded into the system immediately at time 0
+    order_ids = np.concatenate([backlog['id'], last_order_id + 1 + np.arange(arrivals.size)])
+    # Current Global Time = (Previous Days * 24) + Current Time
+    arrival_global = np.concatenate([backlog['arrival_global'], day * HOURS_PER_DAY + arrivals])
+    stage = np.concatenate([backlog['stage'], np.zeros(arrivals.size, dtype=np.int8)])
+    t = np.concatenate([np.zeros(backlog.size), arrivals])
+
+    # Service times for every order at every station, sampled in one call.
+    # Backlogged orders only need what was left of the job at the station they stopped at.
+    service = service_rng.exponential(_PROC_MEANS, size=(t.size, _PROC_MEANS.size))
+    service[np.arange(backlog.size), backlog['stage']] = backlog['stage_remaining_hours']
+
+    # Prep -> Assembly -> Testing
+    starts, departures = run_line(t, service, machine_counts_tuple, stage)
+    t = departures[:, -1]
+
+    finished = np.flatnonzero(t <= HOURS_PER_DAY)
+    finished = finished[np.argsort(t[finished], kind='stable')]
+
+    lead_times = day * HOURS_PER_DAY + t - arrival_global
+    revenues = np.where(lead_times > MAX_LEAD_TIME_FOR_BONUS,
+                        REVENUE_PER_ORDER - LATE_PENALTY, REVENUE_PER_ORDER)
+
+    completed_orders = {
+        'order_id': order_ids[finished].astype(np.int32),
+        'revenue': revenues[finished].astype(np.int32),
+        'day': np.full(finished.size, day + 1, dtype=np.int16),
+        'lead': lead_times[finished].astype(np.float32)
+    }
+
+    # Anything still in the factory at midnight carries over to tomorrow, at the
+    # station it had not yet left (NaN marks stations skipped today, so never "late")
+    unfinished = np.flatnonzero(t > HOURS_PER_DAY)
+    stopped_at = (departures[unfinished] > HOURS_PER_DAY).argmax(axis=1)
+    # Queued orders keep their whole job; orders on a machine keep the rest of it
+    remaining = (departures[unfinished, stopped_at]
+                 - np.maximum(starts[unfinished, stopped_at], HOURS_PER_DAY))
+    # Store in queue order so tomorrow's FIFO picks up where today's left off
+    queue_order = np.argsort(starts[unfinished, stopped_at], kind='stable')
+
+    remaining_backlog = np.empty(unfinished.size, dtype=BACKLOG_DTYPE)
+    remaining_backlog['id'] = order_ids[unfinished][queue_order]
+    remaining_backlog['arrival_global'] = arrival_global[unfinished][queue_order]
+    remaining_backlog['stage'] = stopped_at[queue_order]
+    remaining_backlog['stage_remaining_hours'] = remaining[queue_order]
+    return completed_orders, remaining_backlog, last_order_id + arrivals.size
+
+
+def replicate(rep, machine_counts_tuple, start_day, days, backlog, last_order_id):
+    # One Monte Carlo run of the next `days` days from the given factory state. Returns
+    # the revenue earned on each day. Seeds go through spawn_key rather than extra entropy
+    # words: SeedSequence drops trailing zeros, so (RANDOM_SEED, day, 0) would equal
+    # day_seed(day) and replication 0 would replay the game's real future.
+    revenue = np.zeros(days)
+    for i in range(days):
+        day = start_day + i
+        completed, backlog, last_order_id = simulate_day(
+            machine_counts_tuple, np.random.SeedSequence(RANDOM_SEED, spawn_key=(day, rep)),
+            day, backlog, last_order_id)
+        revenue[i] = completed['revenue'].sum()
+    return revenue